@@ -0,0 +1,165 @@
+from LocalAllocator import LocalAllocator
+from StackSimulation import StackSimulation
+
+
+class CommonSubexpressions:
+
+    # OS subroutines without side effects, and their number of arguments.
+    PURE_CALLS = {
+        "Math.multiply": 2,
+        "Math.divide": 2,
+        "Math.min": 2,
+        "Math.max": 2,
+        "Math.abs": 1,
+        "Math.sqrt": 1
+    }
+
+    # Approximate number of commands a call runs, used to decide whether reusing a value pays off.
+    CALL_COST = 20
+
+    def __init__(self):
+        self.eliminated = [] # (subroutine name, number of reused values, number of removed computations).
+        self.stack = StackSimulation(CommonSubexpressions.PURE_CALLS)
+
+
+    def eliminate(self, commands):
+        """Computes repeated side effect free expressions once per basic block and reuses their values.
+        Takes a list of VM commands starting with the subroutine's function command and returns the rewritten commands.
+        The first computation of a reused value is saved in a new local, the later ones are replaced by pushing it."""
+
+        name, nlocals = commands[0].split()[1:]
+        first_temp = max(int(nlocals), LocalAllocator().count_locals(commands))
+
+        saves = {} # Keys are the end positions of saved computations and values are their locals.
+        replacements = {} # Keys are the start positions of replaced computations and values are (end, local).
+        reused = 0
+        removed = 0
+
+        for occurrences in self.find_expressions(commands):
+            # Reuse the most expensive expressions first, the ones nested in them may not repeat anymore.
+            for key in sorted(occurrences, key=lambda key: -self.cost(commands, occurrences[key][0])):
+                ranges = [(start, end) for start, end in occurrences[key] if not self.is_replaced(start, end, replacements)]
+                if len(ranges) < 2 or (len(ranges) - 1) * (self.cost(commands, ranges[0]) - 1) <= 2:
+                    continue
+
+                local = first_temp + reused
+                saves[ranges[0][1]] = local
+                for start, end in ranges[1:]:
+                    replacements[start] = (end, local)
+                reused += 1
+                removed += len(ranges) - 1
+
+        if not reused:
+            return commands
+
+        eliminated_commands = [f"function {name} {first_temp + reused}"]
+        i = 1
+        while i < len(commands):
+            if i in replacements:
+                end, local = replacements[i]
+                eliminated_commands.append(f"push local {local}")
+                i = end
+            else:
+                eliminated_commands.append(commands[i])
+                i += 1
+
+            if i in saves:
+                eliminated_commands.append(f"pop local {saves[i]}")
+                eliminated_commands.append(f"push local {saves[i]}")
+
+        self.eliminated.append((name, reused, removed))
+
+        return eliminated_commands
+
+
+    def find_expressions(self, commands):
+        """Yields, for each basic block, a dictionary of the block's side effect free expressions.
+        Keys describe an expression's value and values are lists of the (start, end) positions of the commands computing it.
+        Variables are versioned, so reading a variable before and after it is written gives different keys."""
+
+        versions = {} # Keys are (segment, index) of variables and values are the number of times they were written.
+        memory = 0 # Number of times static variables, fields or array entries could have been written.
+        pointer = ("pointer", 0) # Key of the address pointer 1 was set to.
+        unknown = 0
+
+        stack = []
+        occurrences = {}
+        for i, command in enumerate(commands):
+            parts = command.split()
+
+            if parts[0] == "push":
+                segment, index = parts[1], int(parts[2])
+                if segment == "constant":
+                    key = ("constant", index)
+                elif segment in ("local", "argument", "temp"):
+                    key = (segment, index, versions.get((segment, index), 0))
+                elif segment == "that":
+                    key = (segment, index, pointer, memory)
+                else:
+                    key = (segment, index, memory)
+                stack.append((key, i))
+
+            elif self.stack.operation_nargs(parts) is not None:
+                operator = parts[0] if parts[0] != "call" else parts[1]
+                operands = self.stack.pop(stack, self.stack.operation_nargs(parts))
+                if all(key for key, start in operands):
+                    key = (operator,) + tuple(key for key, start in operands)
+                    start = operands[0][1]
+                    if self.is_expression(commands[start:i + 1]):
+                        occurrences.setdefault(key, []).append((start, i + 1))
+                else:
+                    key = None
+                    start = operands[0][1] if operands else i
+                stack.append((key, start))
+
+            elif parts[0] == "call":
+                operands = self.stack.pop(stack, int(parts[2]))
+                stack.append((None, operands[0][1] if operands and operands[0][1] is not None else i))
+                # The subroutine may write any static variable, field or array entry.
+                memory += 1
+
+            elif parts[0] == "pop":
+                segment, index = parts[1], int(parts[2])
+                popped = self.stack.pop(stack, 1)[0][0]
+                if segment == "pointer" and index == 1:
+                    if popped:
+                        pointer = popped
+                    else:
+                        unknown += 1
+                        pointer = ("unknown", unknown)
+                elif segment in ("local", "argument", "temp"):
+                    versions[(segment, index)] = versions.get((segment, index), 0) + 1
+                else:
+                    memory += 1
+
+            else:
+                # Labels and jumps end the basic block.
+                yield occurrences
+                occurrences = {}
+                stack = []
+                unknown += 1
+                pointer = ("unknown", unknown)
+
+        yield occurrences
+
+
+    def is_expression(self, commands):
+        # Checks that the only side effect of the commands is setting pointer 1 for their own array accesses.
+
+        for command in commands:
+            if command.startswith("pop") and command != "pop pointer 1":
+                return False
+
+        return True
+
+
+    def is_replaced(self, start, end, replacements):
+        # Checks whether the commands are part of an already replaced computation.
+
+        return any(other_start <= start and end <= other_end for other_start, (other_end, local) in replacements.items())
+
+
+    def cost(self, commands, positions):
+        start, end = positions
+
+        return sum(CommonSubexpressions.CALL_COST if command.startswith("call") else 1 for command in commands[start:end])
@@ -1,5 +1,13 @@
 import re
 import sys
+from Peephole import Peephole
+from Inliner import Inliner
+from LocalAllocator import LocalAllocator
+from CommonSubexpressions import CommonSubexpressions
+from LoopInvariants import LoopInvariants
+from ControlFlowGraph import ControlFlowGraph
+from TailCalls import TailCalls
+from Intrinsics import Intrinsics
 
 class CompilationEngine:
 
@@ -8,13 +16,56 @@ class CompilationEngine:
         "type": "(int|char|boolean|^[a-zA-Z_][a-zA-Z0-9_]*)"
     }
 
-    def __init__(self, tokenizer, symbol_table, vmwriter):
+    # Most pooled strings a class can have. Pooled strings take static variables, which the whole program
+    # shares with its own static variables in the 240 words of the static segment.
+    STRING_POOL_SIZE = 32
+    STATIC_SEGMENT_SIZE = 240
+
+    def __init__(self, tokenizer, symbol_table, vmwriter, pool_strings=False, profile=None, pack_locals=False,
+                 common_subexpressions=False, hoist_invariants=False, optimize_branches=False,
+                 eliminate_tail_calls=False, intrinsics=True):
         self.class_name = ""
+        self.subroutine_name = ""
+        self.subroutine_type = ""
+        self.subroutine_position = 0 # Position of the subroutine's first command in the writer.
         self.label_num = 0
+        self.branch_num = 0 # Number of the next if or while statement in the subroutine.
+
+        # In pooling mode every distinct string literal is built once into a hidden static variable,
+        # so all its uses share one String object (see compile_string_constant).
+        self.pool_strings = pool_strings
+        self.string_pool = {} # Keys are string literals and values are the number of sites using them.
+        self.unpooled_strings = 0 # Number of sites which aren't pooled because the pool is full.
+
+        # Recorded execution counts guiding inlining, branch layout and the order of subroutines.
+        self.profile = profile
+
+        # Locals which are never live at the same time share a local slot.
+        self.pack_locals = pack_locals
+
+        # Repeated expressions of a basic block are computed once and their values kept in new locals.
+        self.common_subexpressions = common_subexpressions
+
+        # Loop invariant expressions are computed once in front of their while loop.
+        self.hoist_invariants = hoist_invariants
+
+        # Jumps are threaded and basic blocks laid out to run as few jumps as possible.
+        self.optimize_branches = optimize_branches
+
+        # Calls of the subroutine itself followed by a return become jumps to the subroutine's start.
+        self.eliminate_tail_calls = eliminate_tail_calls
+
+        # Calls of simple OS subroutines are replaced by inline commands.
+        self.intrinsics = Intrinsics() if intrinsics else None
 
         self.tokenizer = tokenizer
         self.table = symbol_table
         self.writer = vmwriter
+        self.peephole = Peephole()
+        self.allocator = LocalAllocator()
+        self.subexpressions = CommonSubexpressions()
+        self.invariants = LoopInvariants()
+        self.tail_calls = TailCalls()
 
         # Begin the compilation
         self.tokenizer.advance()
@@ -24,6 +75,8 @@ class CompilationEngine:
     def compile_class(self):
         """Compiles a complete class."""
 
+        class_position = self.writer.position()
+
         self.eat("class")
         self.class_name = self.eat(CompilationEngine.COMMON_PATTERNS["identifier"])
         self.eat("\{")
@@ -43,6 +96,12 @@ class CompilationEngine:
 
         self.eat("\}")
 
+        if self.string_pool or self.unpooled_strings:
+            self.report_string_pool()
+
+        if self.profile:
+            self.optimize_class(class_position)
+
 
     def compile_class_var_dec(self):
         """Compiles a static variable declaration, or a field declaration."""
@@ -53,8 +112,6 @@ class CompilationEngine:
 
         variable = {}
 
-        self.f.write("<classVarDec>\n")
-
         variable["kind"] = self.eat("(static|field)")
         variable["type"] = self.eat(CompilationEngine.COMMON_PATTERNS["type"])
         variable["name"] = self.eat(CompilationEngine.COMMON_PATTERNS["identifier"])
@@ -67,8 +124,6 @@ class CompilationEngine:
         # Add the variable to the class table
         self.table.define(variable["name"], variable["type"], variable["kind"])
 
-        self.f.write(f"<type: {variable['type']}, kind: {variable['kind']}, index: {self.table.index_of(variable['name'])}>{variable['name']}</>\n")
-
         # There can be zero or more additional varNames.
         while True:
             try: # This one is optional. If there is no ',' then stop searching for additional varNames.
@@ -90,13 +145,8 @@ class CompilationEngine:
             # Add the variable to the class table
             self.table.define(variable["name"], variable["type"], variable["kind"])
 
-            self.f.write(f"<type: {variable['type']}, kind: {variable['kind']}, index: {self.table.index_of(variable['name'])}>{variable['name']}</>\n")
-
-
         self.eat("\;")
 
-        self.f.write("</classVarDec>\n")
-
 
     def compile_subroutine_dec(self):
         """Compiles a complete method, function or constructor."""
@@ -109,6 +159,7 @@ class CompilationEngine:
         self.table.start_subroutine()
 
         function_type = self.eat("(constructor|function|method)")
+        self.subroutine_type = function_type
 
         # If it's a method, add 'this' as the first argument.
         if function_type == "method":
@@ -116,12 +167,76 @@ class CompilationEngine:
 
         self.eat(f"(void|{CompilationEngine.COMMON_PATTERNS['type']})")
         subroutine_name = self.eat(CompilationEngine.COMMON_PATTERNS["identifier"])
+        self.subroutine_name = f"{self.class_name}.{subroutine_name}"
+        self.label_num = 0 # Labels are local to the function in the VM.
+        self.branch_num = 0
         self.eat("\(")
         self.compile_parameter_list()
         self.eat("\)")
-        self.writer.write_function(f"{self.class_name}.{subroutine_name}", self.table.var_count("arg"))
+        self.subroutine_position = self.writer.position()
+        # The number of locals is written again once the subroutine's body has been compiled.
+        self.writer.write_function(self.subroutine_name, self.table.var_count("var"))
+        # A method's object is its first argument.
+        if function_type == "method":
+            self.writer.write_push("argument", 0)
+            self.writer.write_pop("pointer", 0)
         self.compile_subroutine_body()
 
+        self.optimize_subroutine(self.subroutine_position)
+
+
+    def optimize_subroutine(self, position):
+        """Rewrites the VM commands of the subroutine starting at the given position."""
+
+        commands = self.writer.cut(position)
+        nlocals = max(self.table.var_count("var"), self.allocator.count_locals(commands))
+        commands[0] = f"function {self.subroutine_name} {nlocals}"
+
+        if self.eliminate_tail_calls:
+            transformed = len(self.tail_calls.transformed)
+            commands = self.tail_calls.eliminate(commands, self.table.var_count("arg"))
+            for name, count in self.tail_calls.transformed[transformed:]:
+                print(f"{name}: {count} recursive tail calls turned into jumps.")
+
+        if self.optimize_branches:
+            commands = ControlFlowGraph(commands).optimize()
+
+        if self.common_subexpressions:
+            eliminated = len(self.subexpressions.eliminated)
+            commands = self.subexpressions.eliminate(commands)
+            for name, reused, removed in self.subexpressions.eliminated[eliminated:]:
+                print(f"{name}: {reused} common subexpressions reused, {removed} computations removed.")
+
+        commands = self.peephole.remove_pointer_reloads(commands)
+
+        if self.pack_locals:
+            commands = self.allocator.allocate(commands)
+            name, before, after = self.allocator.frames[-1]
+            if after < before:
+                print(f"{name}: frame reduced from {before} to {after} locals.")
+
+        self.writer.write_commands(commands)
+
+
+    def optimize_class(self, position):
+        """Rewrites the VM commands of the class starting at the given position using the profile.
+        Hot subroutines are inlined into their callers and subroutines are ordered from the most called one."""
+
+        subroutines = []
+        for command in self.writer.cut(position):
+            if command.startswith("function"):
+                subroutines.append([])
+            subroutines[-1].append(command)
+
+        inliner = Inliner(self.profile)
+        subroutines = inliner.inline(subroutines)
+        for caller, callee in inliner.inlined:
+            print(f"{caller}: inlined a call to {callee}.")
+
+        subroutines.sort(key=lambda commands: -self.profile.call_count(commands[0].split()[1]))
+        for commands in subroutines:
+            self.writer.write_commands(commands)
+
 
     def compile_parameter_list(self):
         """Compiles a (possibly empty) parameter list. Does not handle the enclosing ()."""
@@ -238,70 +353,130 @@ class CompilationEngine:
             is_array = False
 
         if is_array:
-            self.compile_expression()
+            index_commands = self.compile_array_index()
             self.eat("\]")
 
         self.eat("\=")
+        value_position = self.writer.position()
+        # A string literal assigned to a variable may be disposed of or changed through it, so it isn't pooled.
+        pool_strings = self.pool_strings
+        if "\"" in self.tokenizer.current_token:
+            self.pool_strings = False
         self.compile_expression()
+        self.pool_strings = pool_strings
         self.eat("\;")
 
         type, kind, index = self.get_symbol_values(var_name)
-        if type and kind:
-            self.writer.write_pop(kind, index)
-        else:
+        if not (type and kind):
             raise SyntaxError(f"Variable {var_name} is undefined.")
 
+        if is_array:
+            self.write_array_write(kind, index, index_commands, self.writer.cut(value_position))
+        else:
+            self.writer.write_pop(kind, index)
+
 
     def compile_if(self):
-        """Compiles an if statement, possibly with a trailing else clause."""
+        """Compiles an if statement, possibly with a trailing else clause.
+        If the profile shows the else clause runs more often, it is placed first so it doesn't jump over the if clause."""
+
+        branch_counts = self.next_branch_counts()
+        first_label = self.new_label()
+        end_label = self.new_label()
 
         self.eat("if")
         self.eat("\(")
+        position = self.writer.position()
         self.compile_expression()
         self.eat("\)")
-
-        self.writer.write_arithmetic("not")
-        self.writer.write_if(f"L{self.label_num}")
+        is_comparison = self.is_comparison(self.writer.commands[position:])
+        position = self.writer.position()
 
         self.eat("\{")
         self.compile_statements()
         self.eat("\}")
+        if_commands = self.writer.cut(position)
 
         if self.tokenizer.current_token == "else":
-            self.writer.write_goto(f"L{self.label_num + 1}")
-            self.writer.write_label(f"L{self.label_num}")
-
             self.eat("else")
             self.eat("\{")
             self.compile_statements()
             self.eat("\}")
-
-            self.writer.write_label(f"L{self.label_num + 1}")
-            self.label_num += 2
+            else_commands = self.writer.cut(position)
+
+            # Dropping the 'not' is only safe if the condition is exactly true or false.
+            if is_comparison and branch_counts and branch_counts[1] > branch_counts[0]:
+                self.writer.write_if(first_label)
+                self.writer.write_commands(else_commands)
+                self.writer.write_goto(end_label)
+                self.writer.write_label(first_label)
+                self.writer.write_commands(if_commands)
+            else:
+                self.writer.write_arithmetic("not")
+                self.writer.write_if(first_label)
+                self.writer.write_commands(if_commands)
+                self.writer.write_goto(end_label)
+                self.writer.write_label(first_label)
+                self.writer.write_commands(else_commands)
+
+            self.writer.write_label(end_label)
         else:
-            self.writer.write_label(f"L{self.label_num}")
+            self.writer.write_arithmetic("not")
+            self.writer.write_if(first_label)
+            self.writer.write_commands(if_commands)
+            self.writer.write_label(first_label)
 
 
     def compile_while(self):
-        """Compiles a while statement."""
+        """Compiles a while statement.
+        If the profile shows the loop usually repeats, the condition is placed after the body,
+        so each iteration runs a single if-goto."""
 
-        self.writer.write_label(f"L{self.label_num}")
+        number = self.branch_num
+        branch_counts = self.next_branch_counts()
+        first_label = self.new_label()
+        second_label = self.new_label()
 
         self.eat("while")
         self.eat("\(")
+        position = self.writer.position()
         self.compile_expression()
         self.eat("\)")
-
-        self.writer.write_arithmetic("not")
-        self.writer.write_if(f"L{self.label_num + 1}")
+        condition_commands = self.writer.cut(position)
 
         self.eat("\{")
         self.compile_statements()
         self.eat("\}")
-
-        self.writer.write_goto(f"L{self.label_num}")
-        self.writer.write_label(f"{self.label_num + 1}")
-        self.label_num += 2
+        body_commands = self.writer.cut(position)
+
+        if self.is_comparison(condition_commands) and branch_counts and branch_counts[0] > branch_counts[1]:
+            self.writer.write_goto(second_label)
+            self.writer.write_label(first_label)
+            self.writer.write_commands(body_commands)
+            self.writer.write_label(second_label)
+            self.writer.write_commands(condition_commands)
+            self.writer.write_if(first_label)
+        else:
+            self.writer.write_label(first_label)
+            self.writer.write_commands(condition_commands)
+            self.writer.write_arithmetic("not")
+            self.writer.write_if(second_label)
+            self.writer.write_commands(body_commands)
+            self.writer.write_goto(first_label)
+            self.writer.write_label(second_label)
+
+        if self.hoist_invariants:
+            loop_commands = self.writer.cut(position)
+            # New locals go after all the locals the subroutine uses so far, including the ones of inner loops.
+            first_temp = max(self.table.var_count("var"),
+                self.allocator.count_locals(self.writer.commands[self.subroutine_position:] + loop_commands))
+
+            hoisted = len(self.invariants.hoisted)
+            self.writer.write_commands(self.invariants.hoist(loop_commands, first_temp))
+            # Loops are named by their number among the subroutine's if and while statements, as in profiles,
+            # since the branch optimizations rename labels.
+            for commands in self.invariants.hoisted[hoisted:]:
+                print(f"{self.subroutine_name}: hoisted '{'; '.join(commands)}' out of while statement {number}.")
 
 
     def compile_do(self):
@@ -312,22 +487,22 @@ class CompilationEngine:
         # subroutineCall
         func = self.eat(CompilationEngine.COMMON_PATTERNS["identifier"])
         if self.tokenizer.current_token == ".":
+            num_of_expressions, func = self.compile_method_object(func)
             func += self.eat("\.")
             func += self.eat(CompilationEngine.COMMON_PATTERNS["identifier"])
             self.eat("\(")
-            num_of_expressions = self.compile_expression_list()
+            num_of_expressions += self.compile_expression_list()
             self.eat("\)")
         elif self.tokenizer.current_token == "(":
             func = f"{self.class_name}.{func}"
             self.eat("\(")
-            num_of_expressions = self.compile_expression_list()
+            num_of_expressions = self.compile_method_this() + self.compile_expression_list()
             self.eat("\)")
         else:
             print("Syntax error.")
             sys.exit(1)
 
-        self.writer.write_call(func, num_of_expressions)
-        self.writer.write_pop("temp", 0) # Dispose of the return value.
+        self.write_call(func, num_of_expressions, discard=True)
 
         self.eat("\;")
 
@@ -336,11 +511,11 @@ class CompilationEngine:
         """Compiles a return statement."""
 
         self.eat("return")
-        try:
-            self.compile_expression()
-        except SyntaxError:
+        if self.tokenizer.current_token == ";":
             # If there is no return value, return 0.
             self.writer.write_push("constant", 0)
+        else:
+            self.compile_expression()
         self.eat("\;")
         self.writer.write_return()
 
@@ -407,18 +582,19 @@ class CompilationEngine:
 
             if next_token == "(":
                 self.eat("\(")
-                num_of_expressions = self.compile_expression_list()
+                num_of_expressions = self.compile_method_this() + self.compile_expression_list()
                 self.eat("\)")
 
-                self.writer.write_call(f"{self.class_name}.{class_or_function_identifier}", num_of_expressions)
+                self.write_call(f"{self.class_name}.{class_or_function_identifier}", num_of_expressions)
             else:
+                num_of_expressions, class_or_function_identifier = self.compile_method_object(class_or_function_identifier)
                 self.eat("\.")
                 function_identfier = self.eat(CompilationEngine.COMMON_PATTERNS["identifier"])
                 self.eat("\(")
-                num_of_expressions = self.compile_expression_list()
+                num_of_expressions += self.compile_expression_list()
                 self.eat("\)")
 
-                self.writer.write_call(f"{class_or_function_identifier}.{function_identfier}", num_of_expressions)
+                self.write_call(f"{class_or_function_identifier}.{function_identfier}", num_of_expressions)
 
         else:
             self.tokenizer.current_token = current_token # Restore the current token.
@@ -440,6 +616,7 @@ class CompilationEngine:
                 # Specific pattern for string constants
                 if "\"" in self.tokenizer.current_token:
                     self.eat("^\".*\"", advance=False)
+                    self.compile_string_constant(self.tokenizer.str_val())
                 else:
                     identifier = self.eat(f"({CompilationEngine.COMMON_PATTERNS['identifier']}|[0-9]+)", advance=False)
 
@@ -449,22 +626,203 @@ class CompilationEngine:
                         type, kind, index = self.get_symbol_values(identifier)
 
                         # If identifier is not in the symbol table, it can be assumed it is a subroutine name or a class name.
-                        if type and kind:
+                        # Array entries push their base after the index has been compiled.
+                        if type and kind and next_token != "[":
                             self.writer.write_push(kind, index)
 
                 self.tokenizer.current_token = next_token # Set the tokenizer's current token to the previously stored next token.
 
                 if self.tokenizer.current_token == "[":
                     self.eat("\[")
-                    self.compile_expression()
+                    index_commands = self.compile_array_index()
                     self.eat("\]")
 
+                    self.write_array_read(kind, index, index_commands)
+
+
+    def compile_array_index(self):
+        """Compiles an array index expression. Does not handle the enclosing [].
+        The compiled commands are removed from the writer and returned, so they can be placed around the array base."""
+
+        position = self.writer.position()
+        self.compile_expression()
+
+        return self.writer.cut(position)
+
+
+    def write_array_read(self, kind, index, index_commands):
+        # Pushes the value of an array entry. Constant indexes are addressed relative to the array base
+        # with 'that <index>', so several constant index accesses to the same array share one pointer 1 setting.
+
+        self.writer.write_push(kind, index)
+        if self.is_constant(index_commands):
+            self.writer.write_pop("pointer", 1)
+            self.writer.write_push("that", index_commands[0].split()[2])
+        else:
+            self.writer.write_commands(index_commands)
+            self.writer.write_arithmetic("add")
+            self.writer.write_pop("pointer", 1)
+            self.writer.write_push("that", 0)
+
+
+    def write_array_write(self, kind, index, index_commands, value_commands):
+        # Pops the value into an array entry.
+        # If the entry's address is the same whether computed before or after the value, the value is computed first
+        # and popped directly into the entry. This also makes array to array assignments avoid the temp segment.
+
+        stable_segments = ("constant", "local", "argument") # Segments no other subroutine can change.
+        index_is_simple = len(index_commands) == 1 and index_commands[0].startswith("push")
+        address_is_stable = (kind in stable_segments and index_is_simple
+            and index_commands[0].split()[1] in stable_segments)
+        pure = not self.has_side_effects(index_commands) and not self.has_side_effects(value_commands)
+
+        if pure or address_is_stable:
+            self.writer.write_commands(value_commands)
+            self.writer.write_push(kind, index)
+            if self.is_constant(index_commands):
+                self.writer.write_pop("pointer", 1)
+                self.writer.write_pop("that", index_commands[0].split()[2])
+            else:
+                self.writer.write_commands(index_commands)
+                self.writer.write_arithmetic("add")
+                self.writer.write_pop("pointer", 1)
+                self.writer.write_pop("that", 0)
+        else:
+            self.writer.write_push(kind, index)
+            self.writer.write_commands(index_commands)
+            self.writer.write_arithmetic("add")
+            self.writer.write_commands(value_commands)
+            self.writer.write_pop("temp", 0)
+            self.writer.write_pop("pointer", 1)
+            self.writer.write_push("temp", 0)
+            self.writer.write_pop("that", 0)
+
+
+    def is_constant(self, commands):
+        # Checks whether the commands push a single constant.
+
+        return len(commands) == 1 and commands[0].startswith("push constant")
+
+
+    def has_side_effects(self, commands):
+        # Checks whether the commands call a subroutine or change a variable or memory.
+        # Setting pointer 1 and using the temp segment only affects the commands' own array accesses.
+
+        for command in commands:
+            parts = command.split()
+            if parts[0] == "call" or (parts[0] == "pop" and parts[1] not in ("pointer", "temp")):
+                return True
+
+        return False
+
+
+    def compile_string_constant(self, string):
+        """Compiles a string constant.
+        In pooling mode the string is built only on its first use and kept in a hidden static variable.
+        Every evaluation then gives the same String object, so disposing of it or changing its characters,
+        for instance in a subroutine it's passed to, affects all the later uses of the literal.
+        Literals assigned by a let statement are never pooled for that reason.
+        Once the pool is full or the static segment is used up, new literals are built on every use again."""
+
+        if not self.pool_strings:
+            self.write_string(string)
+            return
+
+        # The quotes make the name impossible to clash with a real identifier.
+        hidden_name = f"\"{string}\""
+        if not self.var_already_defined(hidden_name):
+            if (len(self.string_pool) >= CompilationEngine.STRING_POOL_SIZE
+                    or self.table.var_count("static") >= CompilationEngine.STATIC_SEGMENT_SIZE):
+                self.unpooled_strings += 1
+                self.write_string(string)
+                return
+            self.table.define(hidden_name, "String", "static")
+            self.string_pool[string] = 0
+
+        site = sum(self.string_pool.values())
+        self.string_pool[string] += 1
+        index = self.table.index_of(hidden_name)
+
+        # The static is 0 until the string has been built, after that it holds the string's address.
+        self.writer.write_push("static", index)
+        self.writer.write_if(f"STRING_{site}")
+        self.write_string(string)
+        self.writer.write_pop("static", index)
+        self.writer.write_label(f"STRING_{site}")
+        self.writer.write_push("static", index)
+
+
+    def write_string(self, string):
+        # Builds a new string with String.new followed by one String.appendChar per character.
+
+        self.writer.write_push("constant", len(string))
+        self.writer.write_call("String.new", 1)
+        for char in string:
+            self.writer.write_push("constant", ord(char))
+            self.writer.write_call("String.appendChar", 2)
+
+
+    def report_string_pool(self):
+        # Once a pooled string is built, every evaluation of its sites skips String.new and all the String.appendChar calls.
+
+        sites = sum(self.string_pool.values())
+        saved_calls = sum((len(string) + 1) * uses for string, uses in self.string_pool.items())
+        print(f"{self.class_name}: {len(self.string_pool)} pooled strings used at {sites} sites, "
+              f"{saved_calls} calls saved each time every site is evaluated once the pool is built.")
+        if self.unpooled_strings:
+            print(f"{self.class_name}: the string pool is full, {self.unpooled_strings} sites build their strings on every use.")
+
+
+    def write_call(self, name, nargs, discard=False):
+        """Writes a subroutine call, or the inline commands replacing it if the subroutine is an intrinsic.
+        If discard is set, the return value is disposed of, as in a do statement."""
+
+        if self.intrinsics and self.intrinsics.has(name, nargs):
+            self.writer.write_commands(self.intrinsics.expand(name, self.new_label))
+            returns_value = self.intrinsics.returns_value(name)
+        else:
+            self.writer.write_call(name, nargs)
+            returns_value = True
+
+        if discard and returns_value:
+            self.writer.write_pop("temp", 0) # Dispose of the return value.
+        elif not discard and not returns_value:
+            self.writer.write_push("constant", 0) # Void subroutines return 0.
+
+
+    def compile_method_object(self, name):
+        """Pushes the object for a call of a subroutine prefixed by a variable name, which is a method of the variable.
+        Returns the number of pushed arguments and the class name the subroutine belongs to."""
+
+        type, kind, index = self.get_symbol_values(name)
+        if not (type and kind):
+            return 0, name
+
+        self.writer.write_push(kind, index)
+
+        return 1, type
+
+
+    def compile_method_this(self):
+        """Pushes the current object for a call of a subroutine without a class or variable name,
+        which is a method of the current object when called from a method. Returns the number of pushed arguments."""
+
+        if self.subroutine_type != "method":
+            return 0
+
+        self.writer.write_push("pointer", 0)
+
+        return 1
+
 
     def compile_expression_list(self):
         """Compiles a (possibly empty) comma-separated list of expressions."""
 
         num_of_expressions = 0
 
+        if self.tokenizer.current_token == ")":
+            return num_of_expressions
+
         try:
             self.compile_expression()
             num_of_expressions += 1
@@ -500,6 +858,33 @@ class CompilationEngine:
             return token
 
 
+    def new_label(self):
+        # Returns a label which hasn't been used in the subroutine yet.
+
+        label = f"L{self.label_num}"
+        self.label_num += 1
+
+        return label
+
+
+    def next_branch_counts(self):
+        # Returns the profile's taken and not taken counts of the next if or while statement of the subroutine.
+
+        number = self.branch_num
+        self.branch_num += 1
+
+        if not self.profile:
+            return None
+
+        return self.profile.branch_counts(self.subroutine_name, number)
+
+
+    def is_comparison(self, commands):
+        # Checks whether the commands end with a comparison, whose result is always exactly true (-1) or false (0).
+
+        return bool(commands) and commands[-1] in ("lt", "gt", "eq")
+
+
     def var_already_defined(self, var_name):
         if self.table.index_of(var_name) != None:
             return True
@@ -512,4 +897,8 @@ class CompilationEngine:
         kind = self.table.kind_of(symbol_name)
         index = self.table.index_of(symbol_name)
 
+        # Fields are stored in the current object, which is the this segment.
+        if kind == "field":
+            kind = "this"
+
         return type, kind, index
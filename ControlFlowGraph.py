@@ -0,0 +1,265 @@
+class ControlFlowGraph:
+    """Control flow graph of a subroutine's VM commands, used to thread jumps and lay out branches.
+
+    Each basic block is a dictionary with the keys:
+        labels      the labels placed in front of the block
+        commands    the block's commands, without its labels and its closing jump
+        kind        "goto" for blocks continuing to a single block, "if" for if-goto blocks and "return"
+        jump        whether a "goto" block ends with an explicit goto command, rather than falling through
+        target      the block a goto or if-goto jumps to
+        next        the block an if-goto block falls through to
+        negated     whether an "if" block's condition was a comparison followed by 'not', which was removed,
+                    so the block jumps to its target when the comparison is false
+        boolean     whether an "if" block's condition is a comparison, which is exactly true (-1) or false (0)
+    """
+
+    COMPARISONS = ("lt", "gt", "eq")
+
+    # Blocks with at most this many commands are copied into the blocks jumping to them.
+    DUPLICATE_SIZE = 8
+
+    def __init__(self, commands):
+        """Builds the graph from a list of VM commands starting with the subroutine's function command."""
+
+        self.function = commands[0]
+        self.blocks = []
+
+        labels = {} # Keys are labels and values are the blocks they are placed in front of.
+        block = self.new_block()
+        for command in commands[1:]:
+            parts = command.split()
+            if parts[0] == "label":
+                if block["commands"]:
+                    block = self.new_block()
+                block["labels"].append(parts[1])
+                labels[parts[1]] = len(self.blocks) - 1
+            elif parts[0] in ("goto", "if-goto", "return"):
+                block["kind"] = "return" if parts[0] == "return" else ("goto" if parts[0] == "goto" else "if")
+                block["jump"] = parts[0] == "goto"
+                block["target"] = parts[1] if len(parts) > 1 else None
+                block = self.new_block()
+            else:
+                block["commands"].append(command)
+
+        for i, block in enumerate(self.blocks):
+            following = i + 1 if i + 1 < len(self.blocks) else None
+            if block["kind"] == "goto" and not block["jump"]:
+                block["target"] = following
+            elif block["target"] is not None:
+                block["target"] = labels[block["target"]]
+            if block["kind"] == "if":
+                block["next"] = following
+                self.read_condition(block)
+
+
+    def new_block(self):
+        block = {
+            "labels": [],
+            "commands": [],
+            "kind": "goto",
+            "jump": False,
+            "target": None,
+            "next": None,
+            "negated": False,
+            "boolean": False
+        }
+        self.blocks.append(block)
+
+        return block
+
+
+    def read_condition(self, block):
+        # A comparison followed by 'not' is exactly the opposite comparison, so the 'not' can be
+        # dropped by swapping the block's successors when laying out the code.
+
+        commands = block["commands"]
+        # 'not' twice gives back any value. Conditions like ~(a = b) get a second one from the while or if statement.
+        while commands[-2:] == ["not", "not"]:
+            del commands[-2:]
+
+        if commands[-2:-1] and commands[-1] == "not" and commands[-2] in ControlFlowGraph.COMPARISONS:
+            commands.pop()
+            block["negated"] = True
+            block["boolean"] = True
+        elif commands[-1:] and commands[-1] in ControlFlowGraph.COMPARISONS:
+            block["boolean"] = True
+
+
+    def optimize(self):
+        """Threads jumps, removes unreachable blocks and returns the commands of the laid out blocks."""
+
+        self.thread_jumps()
+        self.duplicate_small_blocks()
+        self.thread_jumps()
+
+        return self.write_commands(self.lay_out())
+
+
+    def thread_jumps(self):
+        """Makes jumps to empty blocks, which only continue to another block, go to that block directly."""
+
+        for block in self.blocks:
+            block["target"] = self.resolve(block["target"])
+            block["next"] = self.resolve(block["next"])
+
+            # An if-goto jumping to the block it falls through to only needs to discard its condition.
+            if block["kind"] == "if" and block["target"] == block["next"]:
+                block["commands"].append("pop temp 0")
+                block["kind"] = "goto"
+                block["jump"] = True
+                block["next"] = None
+
+
+    def resolve(self, i):
+        # Follows the chain of empty blocks starting at the given block.
+
+        visited = set()
+        while i is not None and i not in visited:
+            block = self.blocks[i]
+            if block["commands"] or block["kind"] != "goto" or block["target"] is None:
+                break
+            visited.add(i)
+            i = block["target"]
+
+        return i
+
+
+    def duplicate_small_blocks(self):
+        """Copies small blocks ending with an if-goto or a return into the blocks ending with a goto to them.
+        For while loops, this places a copy of the condition at the end of the body,
+        so every iteration runs one if-goto instead of a goto and an if-goto."""
+
+        for i, block in enumerate(self.blocks):
+            if block["kind"] != "goto" or not block["jump"] or block["target"] in (None, i):
+                continue
+
+            target = self.blocks[block["target"]]
+            if target["kind"] in ("if", "return") and len(target["commands"]) <= ControlFlowGraph.DUPLICATE_SIZE:
+                block["commands"] = block["commands"] + target["commands"]
+                for key in ("kind", "jump", "target", "next", "negated", "boolean"):
+                    block[key] = target[key]
+
+
+    def lay_out(self):
+        """Returns the reachable blocks in the order they should be written.
+        Blocks are chained so that each one is followed by the block it most likely continues to."""
+
+        reachable, loop_headers = self.search()
+
+        order = []
+        placed = set()
+        for i in sorted(reachable):
+            while i is not None and i not in placed:
+                order.append(i)
+                placed.add(i)
+                i = self.preferred_successor(i, placed, loop_headers)
+
+        return order
+
+
+    def search(self):
+        # Returns the blocks reachable from the first one, and the blocks which are the target of a loop's back edge.
+
+        reachable = {0}
+        loop_headers = set()
+        on_path = {0}
+        path = [(0, iter(self.successors(0)))] # Depth first search path of blocks and their successors left to visit.
+
+        while path:
+            i, successors = path[-1]
+            successor = next(successors, None)
+            if successor is None:
+                path.pop()
+                on_path.discard(i)
+            elif successor in on_path:
+                loop_headers.add(successor)
+            elif successor not in reachable:
+                reachable.add(successor)
+                on_path.add(successor)
+                path.append((successor, iter(self.successors(successor))))
+
+        return reachable, loop_headers
+
+
+    def successors(self, i):
+        block = self.blocks[i]
+
+        return [successor for successor in (block["target"], block["next"]) if successor is not None]
+
+
+    def preferred_successor(self, i, placed, loop_headers):
+        block = self.blocks[i]
+        candidates = [successor for successor in self.successors(i) if successor not in placed]
+
+        if block["kind"] != "if" or len(candidates) < 2:
+            return candidates[0] if candidates else None
+
+        # Keep loops together.
+        for successor in (block["next"], block["target"]):
+            if successor in loop_headers:
+                return successor
+
+        # If the block it falls through to has to jump away anyway, like the if clause of an if statement
+        # with an else clause, the 'not' can be dropped by placing the jump's target first.
+        following = self.blocks[block["next"]]
+        if block["negated"] and (following["kind"] == "return" or following["jump"]):
+            return block["target"]
+
+        return block["next"]
+
+
+    def write_commands(self, order):
+        """Returns the commands of the blocks in the given order, with labels only in front of the blocks jumped to."""
+
+        code = [] # (block, commands) pairs. Jumps refer to block numbers until the labels are known.
+        jumped_to = set()
+
+        for position, i in enumerate(order):
+            block = self.blocks[i]
+            following = order[position + 1] if position + 1 < len(order) else None
+            commands = list(block["commands"])
+            jumps = []
+
+            if block["kind"] == "return":
+                commands.append("return")
+            elif block["kind"] == "goto":
+                if block["target"] is not None and block["target"] != following:
+                    jumps.append(("goto", block["target"]))
+            elif block["negated"]:
+                # Jumps to the target when the comparison is false.
+                if following == block["next"]:
+                    commands.append("not")
+                    jumps.append(("if-goto", block["target"]))
+                elif following == block["target"]:
+                    jumps.append(("if-goto", block["next"]))
+                else:
+                    jumps.append(("if-goto", block["next"]))
+                    jumps.append(("goto", block["target"]))
+            else:
+                # Jumps to the target when the condition isn't 0.
+                if following == block["next"]:
+                    jumps.append(("if-goto", block["target"]))
+                elif following == block["target"] and block["boolean"]:
+                    commands.append("not")
+                    jumps.append(("if-goto", block["next"]))
+                else:
+                    jumps.append(("if-goto", block["target"]))
+                    jumps.append(("goto", block["next"]))
+
+            jumped_to.update(target for command, target in jumps)
+            code.append((i, commands, jumps))
+
+        # Name the labels in the order they appear.
+        names = {}
+        for i, commands, jumps in code:
+            if i in jumped_to:
+                names[i] = f"L{len(names)}"
+
+        optimized = [self.function]
+        for i, commands, jumps in code:
+            if i in names:
+                optimized.append(f"label {names[i]}")
+            optimized += commands
+            optimized += [f"{command} {names[target]}" for command, target in jumps]
+
+        return optimized
@@ -0,0 +1,107 @@
+from LocalAllocator import LocalAllocator
+
+
+class Inliner:
+
+    # Callees must be called at least this many times in the profile to be inlined.
+    HOT_CALL_COUNT = 1000
+    # Callees can have at most this many commands, not counting the function command.
+    MAX_SIZE = 24
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.inlined = [] # (caller, callee) pairs of the inlined call sites.
+        self.site_num = 0
+
+
+    def inline(self, subroutines):
+        """Replaces the calls to hot subroutines of the same class with copies of their bodies.
+        Takes and returns a list of subroutines, each given as a list of VM commands starting with its function command.
+        Only small, non recursive subroutines which don't use the pointer, this and that segments are inlined,
+        so the caller's pointers and static variables stay valid. The callee's arguments and locals become new locals of the caller."""
+
+        callees = {}
+        for commands in subroutines:
+            name = commands[0].split()[1]
+            if self.can_inline(commands):
+                callees[name] = commands
+
+        inlined_subroutines = []
+        for commands in subroutines:
+            name, nlocals = commands[0].split()[1:]
+            base = max(int(nlocals), LocalAllocator().count_locals(commands))
+            frame_size = 0 # Number of locals the inlined calls need on top of the caller's ones.
+
+            new_commands = [commands[0]]
+            for command in commands[1:]:
+                parts = command.split()
+                if parts[0] == "call" and parts[1] in callees and parts[1] != name:
+                    callee = callees[parts[1]]
+                    callee_locals = max(int(callee[0].split()[2]), LocalAllocator().count_locals(callee))
+                    frame_size = max(frame_size, int(parts[2]) + callee_locals)
+
+                    new_commands += self.inline_call(callee, int(parts[2]), callee_locals, base)
+                    self.inlined.append((name, parts[1]))
+                else:
+                    new_commands.append(command)
+
+            if frame_size:
+                new_commands[0] = f"function {name} {base + frame_size}"
+            inlined_subroutines.append(new_commands)
+
+        return inlined_subroutines
+
+
+    def can_inline(self, commands):
+        name = commands[0].split()[1]
+        if self.profile.call_count(name) < Inliner.HOT_CALL_COUNT or len(commands) - 1 > Inliner.MAX_SIZE:
+            return False
+        if commands[-1] != "return":
+            return False
+
+        for command in commands[1:]:
+            parts = command.split()
+            if parts[0] == "function" or (parts[0] == "call" and parts[1] == name):
+                return False
+            if parts[0] in ("push", "pop") and parts[1] in ("pointer", "this", "that"):
+                return False
+
+        return True
+
+
+    def inline_call(self, callee, nargs, nlocals, base):
+        # Returns the commands replacing a call of the callee. The arguments are on the stack, the last one on top.
+
+        # Labels are prefixed so they can't clash with the caller's labels or with other inlined calls.
+        prefix = f"INLINE{self.site_num}"
+        end_label = f"{prefix}_END"
+        self.site_num += 1
+
+        commands = []
+        for i in reversed(range(nargs)):
+            commands.append(f"pop local {base + i}")
+        # The VM sets the locals to 0 on every call.
+        for i in range(nlocals):
+            commands.append("push constant 0")
+            commands.append(f"pop local {base + nargs + i}")
+
+        body = callee[1:]
+        for position, command in enumerate(body):
+            parts = command.split()
+            if parts[0] in ("push", "pop") and parts[1] == "argument":
+                commands.append(f"{parts[0]} local {base + int(parts[2])}")
+            elif parts[0] in ("push", "pop") and parts[1] == "local":
+                commands.append(f"{parts[0]} local {base + nargs + int(parts[2])}")
+            elif parts[0] in ("label", "goto", "if-goto"):
+                commands.append(f"{parts[0]} {prefix}_{parts[1]}")
+            elif parts[0] == "return":
+                # The return value is already on top of the stack.
+                if position != len(body) - 1:
+                    commands.append(f"goto {end_label}")
+            else:
+                commands.append(command)
+
+        if "return" in body[:-1]:
+            commands.append(f"label {end_label}")
+
+        return commands
@@ -0,0 +1,96 @@
+class Intrinsics:
+    """Inline VM commands replacing calls of simple OS subroutines.
+
+    Every sequence takes the arguments from the stack, like the call it replaces, and leaves the subroutine's
+    return value on it, unless the subroutine is void. Callers of void intrinsics in an expression push its 0 themselves.
+    The temp segment and pointer 1 are only used after all the arguments have been computed."""
+
+    def __init__(self):
+        # Keys are subroutine names and values are their number of arguments, whether their commands leave a value
+        # on the stack, and the method writing their commands.
+        self.table = {
+            "Memory.peek": (1, True, self.peek),
+            "Memory.poke": (2, False, self.poke),
+            "Math.abs": (1, True, self.abs),
+            "Math.min": (2, True, self.min),
+            "Math.max": (2, True, self.max)
+        }
+
+
+    def has(self, name, nargs):
+        """Checks whether the call of the named subroutine with the given number of arguments can be inlined."""
+
+        return name in self.table and self.table[name][0] == nargs
+
+
+    def returns_value(self, name):
+        """Checks whether the commands replacing a call of the named subroutine leave a value on the stack."""
+
+        return self.table[name][1]
+
+
+    def expand(self, name, new_label):
+        """Returns the commands replacing a call of the named subroutine.
+        new_label is called for every label the commands need."""
+
+        return self.table[name][2](new_label)
+
+
+    def peek(self, new_label):
+        return [
+            "pop pointer 1",
+            "push that 0"
+        ]
+
+
+    def poke(self, new_label):
+        return [
+            "pop temp 0",
+            "pop pointer 1",
+            "push temp 0",
+            "pop that 0"
+        ]
+
+
+    def abs(self, new_label):
+        # Negates the argument if it is below 0.
+        end_label = new_label()
+
+        return [
+            "pop temp 0",
+            "push temp 0",
+            "push temp 0",
+            "push constant 0",
+            "lt",
+            "not",
+            f"if-goto {end_label}",
+            "neg",
+            f"label {end_label}"
+        ]
+
+
+    def min(self, new_label):
+        return self.select("gt", new_label)
+
+
+    def max(self, new_label):
+        return self.select("lt", new_label)
+
+
+    def select(self, comparison, new_label):
+        # Keeps the first argument, unless comparing it with the second one is true, in which case it's replaced by the second one.
+        end_label = new_label()
+
+        return [
+            "pop temp 1",
+            "pop temp 0",
+            "push temp 0",
+            "push temp 0",
+            "push temp 1",
+            comparison,
+            "not",
+            f"if-goto {end_label}",
+            "pop temp 0",
+            "push temp 1",
+            f"label {end_label}"
+        ]
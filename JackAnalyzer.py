@@ -4,6 +4,23 @@ from JackTokenizer import JackTokenizer
 from CompilationEngine import CompilationEngine
 from SymbolTable import SymbolTable
 from VMWriter import VMWriter
+from Profile import Profile
+
+# Command line flags and the CompilationEngine options they turn on.
+OPTIONS = {
+    "--pool-strings": "pool_strings", # Uses of a literal share one String, which must not be disposed of or changed.
+    "--pack-locals": "pack_locals",
+    "--cse": "common_subexpressions",
+    "--licm": "hoist_invariants",
+    "--optimize-branches": "optimize_branches",
+    "--tail-calls": "eliminate_tail_calls"
+}
+
+# Command line flags and the VMWriter options they turn on.
+WRITER_OPTIONS = {
+    "--binary": "binary",
+    "--extended": "extended"
+}
 
 
 def main():
@@ -12,7 +29,26 @@ def main():
         print("You must provide a valid jack file or directory name.")
         sys.exit(1)
 
-    user_input = sys.argv[1]
+    options = {}
+    writer_options = {}
+    for flag in sys.argv[1:]:
+        if flag in OPTIONS:
+            options[OPTIONS[flag]] = True
+        elif flag in WRITER_OPTIONS:
+            writer_options[WRITER_OPTIONS[flag]] = True
+        elif flag == "--no-intrinsics":
+            options["intrinsics"] = False
+        elif flag.startswith("--profile="):
+            options["profile"] = Profile(flag[len("--profile="):])
+        elif flag.startswith("--"):
+            print(f"Unknown option {flag}.")
+            sys.exit(1)
+
+    # The first argument which is not a flag is the file or directory name.
+    user_input = next((arg for arg in sys.argv[1:] if not arg.startswith("--")), None)
+    if user_input is None:
+        print("You must provide a valid jack file or directory name.")
+        sys.exit(1)
 
     files_to_translate = []
     is_directory = ".jack" not in user_input
@@ -29,11 +65,12 @@ def main():
     for file in files_to_translate:
         tokenizer = JackTokenizer(file)
         symbol_table = SymbolTable()
-        vmwriter = VMWriter(file)
-        compilator = CompilationEngine(tokenizer, symbol_table, vmwriter)
+        vmwriter = VMWriter(file, **writer_options)
+        compilator = CompilationEngine(tokenizer, symbol_table, vmwriter, **options)
         # compilator = CompilationEngineCOPY(file, tokenizer, symbol_table)
 
-    tokenizer.close()
+        vmwriter.close()
+        tokenizer.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+class LocalAllocator:
+
+    def __init__(self):
+        self.frames = [] # (subroutine name, locals before, locals after) of every packed subroutine.
+
+
+    def allocate(self, commands):
+        """Packs the locals of a subroutine into as few local slots as possible and returns the rewritten commands.
+        Takes a list of VM commands starting with the subroutine's function command.
+        Locals which are never live at the same time share a slot. Locals read before being written
+        rely on the VM setting every slot to 0, so they only share slots with locals written after their last read."""
+
+        name, nlocals = commands[0].split()[1:]
+        nlocals = max(int(nlocals), self.count_locals(commands))
+
+        live_out = self.get_liveness(commands)
+
+        # Two locals interfere if one is written while the other one is live.
+        interference = {}
+        for i, command in enumerate(commands):
+            parts = command.split()
+            if parts[0] in ("push", "pop") and parts[1] == "local":
+                interference.setdefault(int(parts[2]), set())
+        for i, command in enumerate(commands):
+            parts = command.split()
+            if parts[0] == "pop" and parts[1] == "local":
+                local = int(parts[2])
+                for other in live_out[i] - {local}:
+                    interference[local].add(other)
+                    interference[other].add(local)
+
+        # Give each local the lowest slot none of the interfering locals has, in the order they were declared.
+        slots = {}
+        for local in sorted(interference):
+            taken = {slots[other] for other in interference[local] if other in slots}
+            slots[local] = next(slot for slot in range(len(slots) + 1) if slot not in taken)
+
+        new_nlocals = max(slots.values(), default=-1) + 1
+        self.frames.append((name, nlocals, new_nlocals))
+
+        allocated = [f"function {name} {new_nlocals}"]
+        for command in commands[1:]:
+            parts = command.split()
+            if parts[0] in ("push", "pop") and parts[1] == "local":
+                allocated.append(f"{parts[0]} local {slots[int(parts[2])]}")
+            else:
+                allocated.append(command)
+
+        return allocated
+
+
+    def get_liveness(self, commands):
+        """Returns, for each command, the set of locals whose current value may still be read after it."""
+
+        labels = {}
+        for i, command in enumerate(commands):
+            parts = command.split()
+            if parts[0] == "label":
+                labels[parts[1]] = i
+
+        successors = []
+        for i, command in enumerate(commands):
+            parts = command.split()
+            if parts[0] == "goto":
+                successors.append([labels[parts[1]]])
+            elif parts[0] == "if-goto":
+                successors.append([labels[parts[1]], i + 1])
+            elif parts[0] == "return" or i + 1 == len(commands):
+                successors.append([])
+            else:
+                successors.append([i + 1])
+
+        live_in = [set() for _ in commands]
+        live_out = [set() for _ in commands]
+
+        # Iterate backwards until nothing changes.
+        changed = True
+        while changed:
+            changed = False
+            for i in reversed(range(len(commands))):
+                out = set()
+                for successor in successors[i]:
+                    out |= live_in[successor]
+
+                parts = commands[i].split()
+                live = set(out)
+                if parts[0] in ("push", "pop") and parts[1] == "local":
+                    if parts[0] == "pop":
+                        live.discard(int(parts[2]))
+                    else:
+                        live.add(int(parts[2]))
+
+                if out != live_out[i] or live != live_in[i]:
+                    live_out[i] = out
+                    live_in[i] = live
+                    changed = True
+
+        return live_out
+
+
+    def count_locals(self, commands):
+        """Returns the number of local slots the commands use."""
+
+        indexes = [int(command.split()[2]) for command in commands if command.split()[1:2] == ["local"]]
+
+        return max(indexes, default=-1) + 1
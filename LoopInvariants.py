@@ -0,0 +1,132 @@
+from StackSimulation import StackSimulation
+
+
+class LoopInvariants:
+
+    # OS subroutines without side effects which can't fail, so they can run even if the loop body doesn't.
+    # Math.divide and Math.sqrt are left out, as they fail on some arguments.
+    HOISTABLE_CALLS = {
+        "Math.multiply": 2,
+        "Math.min": 2,
+        "Math.max": 2,
+        "Math.abs": 1
+    }
+
+    def __init__(self):
+        self.hoisted = [] # Commands of every hoisted expression.
+        self.stack = StackSimulation(LoopInvariants.HOISTABLE_CALLS)
+
+
+    def hoist(self, commands, first_temp):
+        """Moves the expressions of a loop whose value can't change while it runs in front of the loop.
+        Takes the commands of a complete while statement and the first local slot which is free for new locals.
+        Returns the commands computing the invariant expressions into new locals, followed by the rewritten loop.
+        Calls are treated as writing every static variable, field and array entry, except the hoistable Math functions."""
+
+        written = set() # (segment, index) of the variables the loop writes.
+        writes_memory = False # Whether the loop may write static variables, fields or array entries.
+        for command in commands:
+            parts = command.split()
+            if parts[0] == "pop":
+                written.add((parts[1], int(parts[2])))
+                if parts[1] in ("static", "this", "that") or (parts[1], parts[2]) == ("pointer", "0"):
+                    writes_memory = True
+            elif parts[0] == "call" and self.stack.operation_nargs(parts) is None:
+                writes_memory = True
+
+        # Keep the outermost invariant expressions worth a local only.
+        expressions = []
+        for start, end in sorted(self.find_invariants(commands, written, writes_memory), key=lambda r: r[0] - r[1]):
+            if not self.is_worth_hoisting(commands[start:end]):
+                continue
+            if not any(other_start <= start and end <= other_end for other_start, other_end in expressions):
+                expressions.append((start, end))
+
+        if not expressions:
+            return commands
+
+        locals_ = {} # Keys are the commands of hoisted expressions and values are the locals holding them.
+        preheader = []
+        replacements = {}
+        for start, end in sorted(expressions):
+            expression = tuple(commands[start:end])
+            if expression not in locals_:
+                locals_[expression] = first_temp + len(locals_)
+                preheader += commands[start:end]
+                preheader.append(f"pop local {locals_[expression]}")
+                self.hoisted.append(list(expression))
+            replacements[start] = (end, locals_[expression])
+
+        loop = []
+        i = 0
+        while i < len(commands):
+            if i in replacements:
+                end, local = replacements[i]
+                loop.append(f"push local {local}")
+                i = end
+            else:
+                loop.append(commands[i])
+                i += 1
+
+        return preheader + loop
+
+
+    def find_invariants(self, commands, written, writes_memory):
+        """Returns the (start, end) positions of the commands computing loop invariant expressions
+        which contain at least one operation and no pop."""
+
+        invariants = []
+        stack = [] # (is invariant, start position) of each value on the simulated stack.
+
+        for i, command in enumerate(commands):
+            parts = command.split()
+
+            if parts[0] == "push":
+                stack.append((self.is_invariant(parts[1], int(parts[2]), written, writes_memory), i))
+
+            elif self.stack.operation_nargs(parts) is not None:
+                # Values pushed before the straight line code started are not invariant.
+                operands = self.stack.pop(stack, self.stack.operation_nargs(parts))
+                invariant = all(is_invariant for is_invariant, start in operands)
+                start = operands[0][1] if operands[0][1] is not None else i
+                if invariant:
+                    invariants.append((start, i + 1))
+                stack.append((invariant, start))
+
+            elif parts[0] == "call":
+                self.stack.pop(stack, int(parts[2]))
+                stack.append((False, i))
+
+            elif parts[0] == "pop":
+                self.stack.pop(stack, 1)
+                # The values below were pushed before the pop, so the commands computing an operation
+                # on them and on later values would include its side effect.
+                stack = [(False, start) for is_invariant, start in stack]
+
+            else:
+                # Labels and jumps end the straight line code.
+                stack = []
+
+        return invariants
+
+
+    def is_worth_hoisting(self, commands):
+        # Expressions of constants only, like -1, take a few commands, which costs less than the local
+        # holding their value, as the VM sets every local to 0 on each call. Calls are always worth a local.
+
+        return any(command.startswith("call") or (command.startswith("push") and not command.startswith("push constant"))
+                   for command in commands)
+
+
+    def is_invariant(self, segment, index, written, writes_memory):
+        # Checks whether pushing the variable gives the same value on every iteration of the loop.
+
+        if segment == "constant":
+            return True
+        if segment in ("local", "argument"):
+            return (segment, index) not in written
+        if segment in ("static", "this"):
+            return not writes_memory
+
+        # Array entries depend on pointer 1, which the loop sets, and temp is only used within single statements.
+        return False
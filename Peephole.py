@@ -0,0 +1,72 @@
+class Peephole:
+
+    # Segments whose values can be changed by a called subroutine or by writing to memory.
+    MEMORY_SEGMENTS = ("static", "this", "that")
+
+    # Segments that can be used as an array base or index when following the content of pointer 1.
+    TRACKED_SEGMENTS = ("constant", "local", "argument", "static", "this")
+
+    def remove_pointer_reloads(self, commands):
+        """Removes the commands setting pointer 1 to the address it already holds.
+        Array accesses set pointer 1 with either 'push base; pop pointer 1' or
+        'push base; push index; add; pop pointer 1'. The content of pointer 1 is followed through
+        each basic block, so consecutive accesses to the same element, or constant index accesses
+        to the same array, set it only once."""
+
+        optimized = []
+        pointer = None # The push commands of the base and the index pointer 1 was last set with.
+
+        i = 0
+        while i < len(commands):
+            address, length = self.get_pointer_address(commands, i)
+            if address:
+                # Keep the commands only if pointer 1 holds a different address.
+                if address != pointer:
+                    optimized.extend(commands[i:i + length])
+                    pointer = address
+                i += length
+                continue
+
+            command = commands[i]
+            optimized.append(command)
+            i += 1
+
+            parts = command.split()
+            if parts[0] in ("label", "function"):
+                # Pointer 1 can hold anything when control reaches a label.
+                pointer = None
+            elif pointer and parts[0] == "pop":
+                # Changing the base, the index, or the pointers themselves invalidates the address.
+                if parts[1] == "pointer" or f"push {parts[1]} {parts[2]}" in pointer:
+                    pointer = None
+                elif parts[1] in Peephole.MEMORY_SEGMENTS and self.uses_memory(pointer):
+                    pointer = None
+            elif pointer and parts[0] == "call" and self.uses_memory(pointer):
+                # Pointer 1 itself is restored on return, but the subroutine could change the base or the index.
+                pointer = None
+
+        return optimized
+
+
+    def get_pointer_address(self, commands, i):
+        # Returns the base and index push commands if an array address is set starting at the given position,
+        # as well as the number of commands setting it.
+
+        if commands[i + 1:i + 2] == ["pop pointer 1"] and self.is_tracked(commands[i]):
+            return (commands[i], None), 2
+        if commands[i + 2:i + 4] == ["add", "pop pointer 1"] and self.is_tracked(commands[i]) and self.is_tracked(commands[i + 1]):
+            return (commands[i], commands[i + 1]), 4
+
+        return None, 0
+
+
+    def is_tracked(self, command):
+        parts = command.split()
+
+        return parts[0] == "push" and parts[1] in Peephole.TRACKED_SEGMENTS
+
+
+    def uses_memory(self, address):
+        # Checks whether the base or the index is stored in memory that other code can change.
+
+        return any(command and command.split()[1] in Peephole.MEMORY_SEGMENTS for command in address)
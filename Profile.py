@@ -0,0 +1,89 @@
+import sys
+
+
+class Profile:
+    """Execution counts recorded while running compiled programs, used to guide the compiler's optimizations.
+
+    A profile is a text file with one record per line. Empty lines and lines starting with # are ignored.
+        call <Class.subroutine> <count>
+            The number of times the subroutine was called.
+        branch <Class.subroutine> <number> <taken> <not taken>
+            The number of times the condition of an if or while statement evaluated to true and to false.
+            Statements are numbered from 0 in the order their 'if' or 'while' keyword appears in the subroutine.
+
+    Subroutine names are the ones written by 'function' VM commands. Counts of records repeated
+    in one file, or in several merged files, are added together."""
+
+    def __init__(self, fname=None):
+        self.calls = {} # Keys are subroutine names and values are call counts.
+        self.branches = {} # Keys are (subroutine name, statement number) and values are [taken, not taken] counts.
+
+        if fname:
+            self.load(fname)
+
+
+    def load(self, fname):
+        """Adds the counts from the given profile file."""
+
+        try:
+            f = open(fname, "r")
+        except IOError:
+            raise IOError
+
+        for line_number, line in enumerate(f, 1):
+            parts = line.split()
+            if not parts or parts[0].startswith("#"):
+                continue
+
+            try:
+                if parts[0] == "call" and len(parts) == 3:
+                    self.calls[parts[1]] = self.calls.get(parts[1], 0) + int(parts[2])
+                elif parts[0] == "branch" and len(parts) == 5:
+                    counts = self.branches.setdefault((parts[1], int(parts[2])), [0, 0])
+                    counts[0] += int(parts[3])
+                    counts[1] += int(parts[4])
+                else:
+                    raise ValueError
+            except ValueError:
+                raise SyntaxError(f"{fname}, line {line_number}: incorrect profile record.")
+
+        f.close()
+
+
+    def save(self, fname):
+        """Writes the profile to the given file."""
+
+        with open(fname, "w") as f:
+            for name, count in sorted(self.calls.items()):
+                f.write(f"call {name} {count}\n")
+            for (name, number), (taken, not_taken) in sorted(self.branches.items()):
+                f.write(f"branch {name} {number} {taken} {not_taken}\n")
+
+
+    def call_count(self, name):
+        """Returns the number of recorded calls of the named subroutine."""
+
+        return self.calls.get(name, 0)
+
+
+    def branch_counts(self, name, number):
+        """Returns the taken and not taken counts of the given statement, or None if they weren't recorded."""
+
+        return self.branches.get((name, number))
+
+
+def main():
+    # Merges several profile runs: python Profile.py merge <output> <profile> [<profile> ...]
+    if len(sys.argv) < 4 or sys.argv[1] != "merge":
+        print("Usage: python Profile.py merge <output file> <profile file> [<profile file> ...]")
+        sys.exit(1)
+
+    profile = Profile()
+    for fname in sys.argv[3:]:
+        profile.load(fname)
+
+    profile.save(sys.argv[2])
+
+
+if __name__ == "__main__":
+    main()
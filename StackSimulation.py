@@ -0,0 +1,37 @@
+class StackSimulation:
+    """Helpers for the passes which simulate the VM stack to find the commands computing each value.
+
+    Stack entries are (value, start) pairs: what the pass knows about the value, which is falsy if nothing is known,
+    and the position of the first command computing it, which is None if it was pushed before the simulation started."""
+
+    BINARY_OPS = ("add", "sub", "and", "or", "lt", "gt", "eq")
+    UNARY_OPS = ("neg", "not")
+
+    def __init__(self, pure_calls):
+        # Keys are the names of the subroutines treated as side effect free operations and values are their number of arguments.
+        self.pure_calls = pure_calls
+
+
+    def operation_nargs(self, parts):
+        """Returns the number of values the side effect free operation given by the command's parts takes from the stack,
+        or None if the command is not such an operation."""
+
+        if parts[0] in StackSimulation.UNARY_OPS:
+            return 1
+        if parts[0] in StackSimulation.BINARY_OPS:
+            return 2
+        if parts[0] == "call" and self.pure_calls.get(parts[1]) == int(parts[2]):
+            return int(parts[2])
+
+        return None
+
+
+    def pop(self, stack, count):
+        """Pops the given number of entries from the simulated stack and returns them in the order they were pushed.
+        Values pushed before the simulation started are unknown."""
+
+        operands = []
+        for _ in range(count):
+            operands.insert(0, stack.pop() if stack else (None, None))
+
+        return operands
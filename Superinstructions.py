@@ -0,0 +1,109 @@
+import sys
+
+
+class Superinstructions:
+    """Extended VM dialect which fuses common command sequences into single commands.
+
+    The dialect adds:
+        inc <segment> <index>   push segment index, push constant 1, add, pop segment index
+        dec <segment> <index>   push segment index, push constant 1, sub, pop segment index
+        if-lt <label>           lt, if-goto label (likewise if-gt and if-eq)
+        if-ge <label>           lt, not, if-goto label (likewise if-le with gt and if-ne with eq)
+
+    Sequences are only fused when lowering gives back exactly the same commands, so lowering is lossless."""
+
+    # Fused commands and the arithmetic command they stand for.
+    INCREMENTS = {
+        "inc": "add",
+        "dec": "sub"
+    }
+
+    # Fused branches and the commands they stand for, without the closing if-goto.
+    BRANCHES = {
+        "if-lt": ("lt",),
+        "if-gt": ("gt",),
+        "if-eq": ("eq",),
+        "if-ge": ("lt", "not"),
+        "if-le": ("gt", "not"),
+        "if-ne": ("eq", "not")
+    }
+
+    def fuse(self, commands):
+        """Returns the commands of the standard VM language rewritten in the extended dialect."""
+
+        fused = []
+        i = 0
+        while i < len(commands):
+            command, length = self.match(commands, i)
+            fused.append(command)
+            i += length
+
+        return fused
+
+
+    def match(self, commands, i):
+        # Returns the fused command for the sequence starting at the given position and the number of commands it replaces.
+
+        parts = commands[i].split()
+
+        if parts[0] == "push" and parts[1] != "constant" and commands[i + 1:i + 2] == ["push constant 1"]:
+            for fused, arithmetic in Superinstructions.INCREMENTS.items():
+                if commands[i + 2:i + 4] == [arithmetic, f"pop {parts[1]} {parts[2]}"] and commands[i] == f"push {parts[1]} {parts[2]}":
+                    return f"{fused} {parts[1]} {parts[2]}", 4
+
+        # Longer branches first, so a comparison followed by 'not' isn't left unfused.
+        for fused, condition in sorted(Superinstructions.BRANCHES.items(), key=lambda item: -len(item[1])):
+            end = i + len(condition)
+            if tuple(commands[i:end]) == condition and end < len(commands):
+                jump = commands[end].split()
+                if jump[0] == "if-goto" and commands[end] == f"if-goto {jump[1]}":
+                    return f"{fused} {jump[1]}", len(condition) + 1
+
+        return commands[i], 1
+
+
+    def lower(self, commands):
+        """Returns the commands of the extended dialect translated back to the standard VM language."""
+
+        lowered = []
+        for command in commands:
+            parts = command.split()
+            if parts[0] in Superinstructions.INCREMENTS:
+                lowered += [
+                    f"push {parts[1]} {parts[2]}",
+                    "push constant 1",
+                    Superinstructions.INCREMENTS[parts[0]],
+                    f"pop {parts[1]} {parts[2]}"
+                ]
+            elif parts[0] in Superinstructions.BRANCHES:
+                lowered += Superinstructions.BRANCHES[parts[0]]
+                lowered.append(f"if-goto {parts[1]}")
+            else:
+                lowered.append(command)
+
+        return lowered
+
+
+def main():
+    # Rewrites a .vm file in place: python Superinstructions.py lower|fuse <file>
+    if len(sys.argv) != 3 or sys.argv[1] not in ("lower", "fuse") or not sys.argv[2].endswith(".vm"):
+        print("Usage: python Superinstructions.py lower|fuse <vm file>")
+        sys.exit(1)
+
+    with open(sys.argv[2], "r") as source:
+        commands = [line.split("//")[0].strip() for line in source]
+    commands = [command for command in commands if command]
+
+    superinstructions = Superinstructions()
+    if sys.argv[1] == "lower":
+        commands = superinstructions.lower(commands)
+    else:
+        commands = superinstructions.fuse(commands)
+
+    with open(sys.argv[2], "w") as target:
+        for command in commands:
+            target.write(f"{command}\n")
+
+
+if __name__ == "__main__":
+    main()
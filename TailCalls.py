@@ -0,0 +1,48 @@
+from LocalAllocator import LocalAllocator
+
+
+class TailCalls:
+
+    # Label the transformed calls jump to, placed right after the function command.
+    ENTRY_LABEL = "TAIL_CALL_ENTRY"
+
+    def __init__(self):
+        self.transformed = [] # (subroutine name, number of transformed calls) of every transformed subroutine.
+
+
+    def eliminate(self, commands, nargs):
+        """Turns the subroutine's calls of itself which are immediately returned into jumps to its start.
+        Takes a list of VM commands starting with the subroutine's function command and its number of arguments,
+        including the object of a method. The new arguments are popped into the argument segment instead of
+        creating a new frame, and the locals the subroutine reads before writing are set to 0 again,
+        as the VM would do on a call."""
+
+        name = commands[0].split()[1]
+        call = f"call {name} {nargs}"
+
+        tail_calls = [i for i in range(1, len(commands) - 1) if commands[i] == call and commands[i + 1] == "return"]
+        if not tail_calls:
+            return commands
+
+        # The locals live at the start of the subroutine are the ones read before being written.
+        zeroed_locals = sorted(LocalAllocator().get_liveness(commands)[0])
+
+        jump = [f"pop argument {i}" for i in reversed(range(nargs))]
+        for local in zeroed_locals:
+            jump.append("push constant 0")
+            jump.append(f"pop local {local}")
+        jump.append(f"goto {TailCalls.ENTRY_LABEL}")
+
+        eliminated = [commands[0], f"label {TailCalls.ENTRY_LABEL}"]
+        i = 1
+        while i < len(commands):
+            if i in tail_calls:
+                eliminated += jump
+                i += 2
+            else:
+                eliminated.append(commands[i])
+                i += 1
+
+        self.transformed.append((name, len(tail_calls)))
+
+        return eliminated
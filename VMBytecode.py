@@ -0,0 +1,194 @@
+import os
+import sys
+
+
+class VMBytecode:
+    """Compact binary encoding of VM commands, stored in .vmb files.
+
+    A file starts with the magic bytes, followed by the string table and the commands:
+        magic       b"VMB1"
+        strings     varint count, then each function or label name as a varint length and its UTF-8 bytes
+        commands    one opcode byte per command, followed by its varint operands until the end of the file
+
+    Varints are unsigned LEB128: 7 bits per byte, lowest bits first, the high bit set on all but the last byte.
+    Function and label names are operands referring to their position in the string table.
+    The fused commands of the extended dialect (see Superinstructions) have opcodes of their own."""
+
+    MAGIC = b"VMB1"
+
+    SEGMENTS = ("constant", "argument", "local", "static", "this", "that", "pointer", "temp")
+    ARITHMETIC = ("add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not")
+    # Fused branches of the extended dialect. New ones must be added at the end, so existing files keep their meaning.
+    BRANCHES = ("if-lt", "if-gt", "if-eq", "if-ge", "if-le", "if-ne")
+
+    # Push and pop opcodes have the segment encoded in their lowest 3 bits.
+    PUSH = 0x00
+    POP = 0x08
+    # Arithmetic opcodes follow the order of ARITHMETIC.
+    ARITHMETIC_BASE = 0x10
+    LABEL = 0x20
+    GOTO = 0x21
+    IF_GOTO = 0x22
+    FUNCTION = 0x23
+    CALL = 0x24
+    RETURN = 0x25
+    # Extended dialect: inc and dec have the segment encoded in their lowest 3 bits,
+    # and fused branch opcodes follow the order of BRANCHES.
+    INC = 0x30
+    DEC = 0x38
+    BRANCH_BASE = 0x40
+
+    def encode(self, commands):
+        """Encodes a list of VM commands and returns the bytes of a .vmb file."""
+
+        strings = {} # Keys are names and values are their positions in the string table.
+        code = bytearray()
+
+        for command in commands:
+            parts = command.split()
+            if parts[0] in ("push", "pop"):
+                opcode = VMBytecode.PUSH if parts[0] == "push" else VMBytecode.POP
+                code.append(opcode + VMBytecode.SEGMENTS.index(parts[1]))
+                code += self.encode_varint(int(parts[2]))
+            elif parts[0] in VMBytecode.ARITHMETIC:
+                code.append(VMBytecode.ARITHMETIC_BASE + VMBytecode.ARITHMETIC.index(parts[0]))
+            elif parts[0] in ("label", "goto", "if-goto"):
+                opcode = {"label": VMBytecode.LABEL, "goto": VMBytecode.GOTO, "if-goto": VMBytecode.IF_GOTO}[parts[0]]
+                code.append(opcode)
+                code += self.encode_varint(strings.setdefault(parts[1], len(strings)))
+            elif parts[0] in ("function", "call"):
+                code.append(VMBytecode.FUNCTION if parts[0] == "function" else VMBytecode.CALL)
+                code += self.encode_varint(strings.setdefault(parts[1], len(strings)))
+                code += self.encode_varint(int(parts[2]))
+            elif parts[0] == "return":
+                code.append(VMBytecode.RETURN)
+            elif parts[0] in ("inc", "dec"):
+                opcode = VMBytecode.INC if parts[0] == "inc" else VMBytecode.DEC
+                code.append(opcode + VMBytecode.SEGMENTS.index(parts[1]))
+                code += self.encode_varint(int(parts[2]))
+            elif parts[0] in VMBytecode.BRANCHES:
+                code.append(VMBytecode.BRANCH_BASE + VMBytecode.BRANCHES.index(parts[0]))
+                code += self.encode_varint(strings.setdefault(parts[1], len(strings)))
+            else:
+                raise ValueError(f"Unknown VM command {command}.")
+
+        table = bytearray(self.encode_varint(len(strings)))
+        for string in strings: # Dictionaries keep the insertion order, which is the order of the positions.
+            data = string.encode("utf-8")
+            table += self.encode_varint(len(data))
+            table += data
+
+        return VMBytecode.MAGIC + bytes(table) + bytes(code)
+
+
+    def decode(self, stream):
+        """Reads a .vmb file from a binary stream and yields its VM commands one at a time."""
+
+        if stream.read(len(VMBytecode.MAGIC)) != VMBytecode.MAGIC:
+            raise ValueError("Not a VM bytecode file.")
+
+        strings = []
+        for _ in range(self.decode_varint(stream)):
+            length = self.decode_varint(stream)
+            data = stream.read(length)
+            if len(data) < length:
+                raise ValueError("Unexpected end of the VM bytecode file.")
+            strings.append(data.decode("utf-8"))
+
+        while True:
+            byte = stream.read(1)
+            if not byte:
+                return
+            opcode = byte[0]
+
+            if opcode < VMBytecode.POP:
+                yield f"push {VMBytecode.SEGMENTS[opcode]} {self.decode_varint(stream)}"
+            elif opcode < VMBytecode.ARITHMETIC_BASE:
+                yield f"pop {VMBytecode.SEGMENTS[opcode - VMBytecode.POP]} {self.decode_varint(stream)}"
+            elif opcode < VMBytecode.ARITHMETIC_BASE + len(VMBytecode.ARITHMETIC):
+                yield VMBytecode.ARITHMETIC[opcode - VMBytecode.ARITHMETIC_BASE]
+            elif opcode == VMBytecode.LABEL:
+                yield f"label {strings[self.decode_varint(stream)]}"
+            elif opcode == VMBytecode.GOTO:
+                yield f"goto {strings[self.decode_varint(stream)]}"
+            elif opcode == VMBytecode.IF_GOTO:
+                yield f"if-goto {strings[self.decode_varint(stream)]}"
+            elif opcode == VMBytecode.FUNCTION:
+                name = strings[self.decode_varint(stream)]
+                yield f"function {name} {self.decode_varint(stream)}"
+            elif opcode == VMBytecode.CALL:
+                name = strings[self.decode_varint(stream)]
+                yield f"call {name} {self.decode_varint(stream)}"
+            elif opcode == VMBytecode.RETURN:
+                yield "return"
+            elif VMBytecode.INC <= opcode < VMBytecode.DEC:
+                yield f"inc {VMBytecode.SEGMENTS[opcode - VMBytecode.INC]} {self.decode_varint(stream)}"
+            elif VMBytecode.DEC <= opcode < VMBytecode.BRANCH_BASE:
+                yield f"dec {VMBytecode.SEGMENTS[opcode - VMBytecode.DEC]} {self.decode_varint(stream)}"
+            elif VMBytecode.BRANCH_BASE <= opcode < VMBytecode.BRANCH_BASE + len(VMBytecode.BRANCHES):
+                yield f"{VMBytecode.BRANCHES[opcode - VMBytecode.BRANCH_BASE]} {strings[self.decode_varint(stream)]}"
+            else:
+                raise ValueError(f"Unknown opcode {opcode}.")
+
+
+    def encode_varint(self, number):
+        data = bytearray()
+        while number >= 0x80:
+            data.append((number & 0x7F) | 0x80)
+            number >>= 7
+        data.append(number)
+
+        return bytes(data)
+
+
+    def decode_varint(self, stream):
+        number = 0
+        shift = 0
+        while True:
+            byte = stream.read(1)
+            if not byte:
+                raise ValueError("Unexpected end of the VM bytecode file.")
+            number |= (byte[0] & 0x7F) << shift
+            if byte[0] < 0x80:
+                return number
+            shift += 7
+
+
+def main():
+    # Converts a .vm file to .vmb, or a .vmb file back to .vm: python VMBytecode.py [--force] <file>
+    # An existing output file is only replaced with --force.
+    file_names = [arg for arg in sys.argv[1:] if arg != "--force"]
+    if len(file_names) != 1:
+        print("You must provide a valid vm or vmb file name.")
+        sys.exit(1)
+
+    file_name = file_names[0]
+    bytecode = VMBytecode()
+
+    if file_name.endswith(".vmb"):
+        target_name = file_name[:-1]
+    elif file_name.endswith(".vm"):
+        target_name = f"{file_name}b"
+    else:
+        print("You must provide a valid vm or vmb file name.")
+        sys.exit(1)
+
+    if os.path.exists(target_name) and "--force" not in sys.argv[1:]:
+        print(f"{target_name} already exists, use --force to replace it.")
+        sys.exit(1)
+
+    if file_name.endswith(".vmb"):
+        # Decode the whole file first, so a damaged file doesn't leave a partial .vm file behind.
+        with open(file_name, "rb") as source:
+            commands = list(bytecode.decode(source))
+        with open(target_name, "w") as target:
+            for command in commands:
+                target.write(f"{command}\n")
+    else:
+        with open(file_name, "r") as source:
+            commands = [line.split("//")[0].strip() for line in source]
+        with open(target_name, "wb") as target:
+            target.write(bytecode.encode([command for command in commands if command]))
+
+if __name__ == "__main__":
+    main()
@@ -1,67 +1,111 @@
+from VMBytecode import VMBytecode
+from Superinstructions import Superinstructions
+
+
 class VMWriter:
 
-    def __init__(self, fname):
+    def __init__(self, fname, binary=False, extended=False):
+        # In binary mode the commands are written to a .vmb file in the compact VMBytecode format.
+        self.binary = binary
+        # In extended mode common command sequences are written as the fused commands of the Superinstructions dialect.
+        self.extended = extended
+
         try:
-            self.f = open(fname.replace(".jack", ".vm"), "w")
+            if binary:
+                self.f = open(fname.replace(".jack", ".vmb"), "wb")
+            else:
+                self.f = open(fname.replace(".jack", ".vm"), "w")
         except IOError:
             raise IOError
 
+        # Commands are kept in memory until the file is closed, so the compiler can still rewrite them.
+        self.commands = []
+
 
     def write_push(self, segment, index):
         """Writes a VM push command."""
 
-        self.f.write(f"push {segment} {index}\n")
+        self.commands.append(f"push {segment} {index}")
 
 
     def write_pop(self, segment, index):
         """Writes a VM pop command."""
 
-        self.f.write(f"pop {segment} {index}\n")
+        self.commands.append(f"pop {segment} {index}")
 
 
     def write_arithmetic(self, command):
         """Writes a VM arithmentic-logical command."""
 
-        self.f.write(f"{command}\n")
+        self.commands.append(command)
 
 
     def write_label(self, label):
         """Writes a VM label command."""
 
-        self.f.write(f"label {label}\n")
+        self.commands.append(f"label {label}")
 
 
     def write_goto(self, label):
         """Writes a VM goto command."""
 
-        self.f.write(f"goto {label}\n")
+        self.commands.append(f"goto {label}")
 
 
     def write_if(self, label):
         """Writes a VM if-goto command."""
 
-        self.f.write(f"if-goto {label}\n")
+        self.commands.append(f"if-goto {label}")
 
 
     def write_call(self, name, nargs):
         """Writes a VM call command."""
 
-        self.f.write(f"call {name} {nargs}\n")
+        self.commands.append(f"call {name} {nargs}")
 
 
     def write_function(self, name, nlocals):
         """Writes a VM function command."""
 
-        self.f.write(f"function {name} {nlocals}\n")
+        self.commands.append(f"function {name} {nlocals}")
 
 
     def write_return(self):
         """Writes a VM return command."""
 
-        self.f.write("return\n")
+        self.commands.append("return")
+
+
+    def write_commands(self, commands):
+        """Writes a list of already formatted VM commands."""
+
+        self.commands.extend(commands)
+
+
+    def position(self):
+        """Returns the position of the next command to be written."""
+
+        return len(self.commands)
+
+
+    def cut(self, position):
+        """Removes all the commands written since the given position and returns them."""
+
+        commands = self.commands[position:]
+        del self.commands[position:]
+
+        return commands
 
 
     def close(self):
-        """Closes the output file."""
+        """Writes all the commands to the output file and closes it."""
+
+        commands = Superinstructions().fuse(self.commands) if self.extended else self.commands
+
+        if self.binary:
+            self.f.write(VMBytecode().encode(commands))
+        else:
+            for command in commands:
+                self.f.write(f"{command}\n")
 
         self.f.close()
@@ -0,0 +1,67 @@
+import unittest
+from CommonSubexpressions import CommonSubexpressions
+
+
+MULTIPLY = ["push local 0", "push local 1", "call Math.multiply 2"]
+
+
+class TestCommonSubexpressions(unittest.TestCase):
+
+    def test_reuses_repeated_expression(self):
+        commands = ["function Main.f 2"] + MULTIPLY + MULTIPLY + ["add", "return"]
+
+        eliminated = CommonSubexpressions().eliminate(commands)
+
+        self.assertEqual(eliminated, [
+            "function Main.f 3",
+            "push local 0", "push local 1", "call Math.multiply 2", "pop local 2", "push local 2",
+            "push local 2",
+            "add", "return"
+        ])
+
+
+    def test_variable_written_between_occurrences(self):
+        commands = (["function Main.f 2"] + MULTIPLY + ["pop local 0"]
+                    + MULTIPLY + ["return"])
+
+        self.assertEqual(CommonSubexpressions().eliminate(commands), commands)
+
+
+    def test_memory_written_between_occurrences(self):
+        fields = ["push this 0", "push this 1", "call Math.multiply 2"]
+        writes = [
+            # A call which isn't pure may write any field.
+            ["call Main.g 0", "pop temp 0"],
+            # An array entry may be a field of the same object.
+            ["push argument 0", "pop pointer 1", "push constant 7", "pop that 0"]
+        ]
+
+        commands = ["function Main.f 0"] + fields + ["pop temp 1"] + fields + ["return"]
+        self.assertNotEqual(CommonSubexpressions().eliminate(commands), commands)
+
+        for write in writes:
+            commands = ["function Main.f 0"] + fields + ["pop temp 1"] + write + fields + ["return"]
+            self.assertEqual(CommonSubexpressions().eliminate(commands), commands)
+
+
+    def test_expression_nested_in_replaced_occurrence(self):
+        # (a * b) * c is computed twice. Once the second one is replaced, the a * b inside it is gone,
+        # so a * b is only reused between its standalone computation and the one in the first (a * b) * c.
+        nested = MULTIPLY + ["push argument 0", "call Math.multiply 2"]
+        commands = ["function Main.f 2"] + MULTIPLY + nested + nested + ["add", "add", "return"]
+
+        subexpressions = CommonSubexpressions()
+        eliminated = subexpressions.eliminate(commands)
+
+        self.assertEqual(eliminated, [
+            "function Main.f 4",
+            "push local 0", "push local 1", "call Math.multiply 2", "pop local 3", "push local 3",
+            "push local 3", "push argument 0", "call Math.multiply 2", "pop local 2", "push local 2",
+            "push local 2",
+            "add", "add", "return"
+        ])
+        self.assertEqual(subexpressions.eliminated, [("Main.f", 2, 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from ControlFlowGraph import ControlFlowGraph
+
+
+class TestControlFlowGraph(unittest.TestCase):
+
+    def test_not_equal_loop(self):
+        # while (~(key = 0)) { let key = key - 1; }
+        commands = [
+            "function Main.f 1",
+            "label L0",
+            "push local 0", "push constant 0", "eq", "not", "not", "if-goto L1",
+            "push local 0", "push constant 1", "sub", "pop local 0",
+            "goto L0",
+            "label L1",
+            "push local 0", "return"
+        ]
+
+        self.assertEqual(ControlFlowGraph(commands).optimize(), [
+            "function Main.f 1",
+            "push local 0", "push constant 0", "eq", "if-goto L1",
+            "label L0",
+            "push local 0", "push constant 1", "sub", "pop local 0",
+            "push local 0", "push constant 0", "eq", "not", "if-goto L0",
+            "label L1",
+            "push local 0", "return"
+        ])
+
+
+    def test_threads_jumps_and_removes_unreachable_blocks(self):
+        commands = [
+            "function Main.f 1",
+            "goto L1",
+            "label L1",
+            "push local 0", "if-goto L2",
+            "goto L3",
+            "label L2",
+            "push constant 1", "return",
+            "label L3",
+            "push constant 2", "return",
+            "push constant 3", "return"
+        ]
+
+        self.assertEqual(ControlFlowGraph(commands).optimize(), [
+            "function Main.f 1",
+            "push local 0", "if-goto L0",
+            "push constant 2", "return",
+            "label L0",
+            "push constant 1", "return"
+        ])
+
+
+    def test_keeps_not_of_non_boolean_condition(self):
+        # if (~x) { return 1; } return 2; where x may be any value, so 'not' can't be replaced by swapping branches.
+        commands = [
+            "function Main.f 1",
+            "push local 0", "not", "not", "not", "if-goto L0",
+            "goto L1",
+            "label L0",
+            "push constant 1", "return",
+            "label L1",
+            "push constant 2", "return"
+        ]
+
+        self.assertEqual(ControlFlowGraph(commands).optimize(), [
+            "function Main.f 1",
+            "push local 0", "not", "if-goto L0",
+            "push constant 2", "return",
+            "label L0",
+            "push constant 1", "return"
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
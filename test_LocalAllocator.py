@@ -0,0 +1,63 @@
+import unittest
+from LocalAllocator import LocalAllocator
+
+
+class TestLocalAllocator(unittest.TestCase):
+
+    def test_shares_slot_of_locals_with_separate_lifetimes(self):
+        commands = [
+            "function Main.f 2",
+            "push constant 1", "pop local 0",
+            "push local 0", "call Output.printInt 1", "pop temp 0",
+            "push constant 2", "pop local 1",
+            "push local 1", "return"
+        ]
+
+        allocated = LocalAllocator().allocate(commands)
+
+        self.assertEqual(allocated[0], "function Main.f 1")
+        self.assertEqual(allocated[7:9], ["pop local 0", "push local 0"])
+
+
+    def test_keeps_slots_of_overlapping_locals(self):
+        commands = [
+            "function Main.f 2",
+            "push constant 1", "pop local 0",
+            "push constant 2", "pop local 1",
+            "push local 0", "push local 1", "add", "return"
+        ]
+
+        self.assertEqual(LocalAllocator().allocate(commands), commands)
+
+
+    def test_local_read_before_written_keeps_its_zero(self):
+        # Local 1 is read before it's written, so it relies on the VM setting it to 0 and can't take local 0's slot.
+        commands = [
+            "function Main.f 2",
+            "push constant 5", "pop local 0",
+            "push local 0", "call Output.printInt 1", "pop temp 0",
+            "push local 1", "return"
+        ]
+
+        self.assertEqual(LocalAllocator().allocate(commands), commands)
+
+
+    def test_local_live_around_loop(self):
+        # Local 0 is read again after local 1 is written, and on the next iteration, so they can't share a slot.
+        commands = [
+            "function Main.f 2",
+            "push constant 3", "pop local 0",
+            "label L0",
+            "push local 0", "push constant 1", "sub", "pop local 1",
+            "push local 0", "push local 1", "and", "pop local 0",
+            "push local 0", "if-goto L0",
+            "push constant 0", "return"
+        ]
+
+        self.assertEqual(LocalAllocator().allocate(commands), commands)
+        # After the if-goto, local 0 is only read again if the loop runs another iteration.
+        self.assertEqual(LocalAllocator().get_liveness(commands)[13], {0})
+
+
+if __name__ == "__main__":
+    unittest.main()
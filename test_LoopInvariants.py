@@ -0,0 +1,56 @@
+import unittest
+from LoopInvariants import LoopInvariants
+
+
+class TestLoopInvariants(unittest.TestCase):
+
+    def test_hoists_invariant_expression(self):
+        # while (i < 5) { let s = k * k; let i = i + 1; }
+        loop = [
+            "label L0",
+            "push local 0", "push constant 5", "lt", "not", "if-goto L1",
+            "push local 2", "push local 2", "call Math.multiply 2", "pop local 1",
+            "push local 0", "push constant 1", "add", "pop local 0",
+            "goto L0",
+            "label L1"
+        ]
+
+        hoisted = LoopInvariants().hoist(loop, 3)
+
+        self.assertEqual(hoisted[:4], ["push local 2", "push local 2", "call Math.multiply 2", "pop local 3"])
+        self.assertIn("push local 3", hoisted)
+
+
+    def test_keeps_expression_with_side_effect(self):
+        # while (i < 5) { let s = k + Memory.poke(3000 + i, 7); let i = i + 1; }
+        # The 0 standing for poke's return value is invariant, but adding it to k must not hoist the poke.
+        loop = [
+            "label L0",
+            "push local 0", "push constant 5", "lt", "not", "if-goto L1",
+            "push local 2", "push constant 3000", "push local 0", "add", "push constant 7",
+            "pop temp 0", "pop pointer 1", "push temp 0", "pop that 0", "push constant 0", "add", "pop local 1",
+            "push local 0", "push constant 1", "add", "pop local 0",
+            "goto L0",
+            "label L1"
+        ]
+
+        self.assertEqual(LoopInvariants().hoist(loop, 3), loop)
+
+
+    def test_keeps_constant_expressions(self):
+        # while (i < n) { let s = s + (-1) + (~0); let i = i + 1; }
+        # Computing -1 and ~0 takes fewer commands than the locals holding them would cost.
+        loop = [
+            "label L0",
+            "push local 0", "push argument 0", "lt", "not", "if-goto L1",
+            "push local 1", "push constant 1", "neg", "add", "push constant 0", "not", "add", "pop local 1",
+            "push local 0", "push constant 1", "add", "pop local 0",
+            "goto L0",
+            "label L1"
+        ]
+
+        self.assertEqual(LoopInvariants().hoist(loop, 2), loop)
+
+
+if __name__ == "__main__":
+    unittest.main()
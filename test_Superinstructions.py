@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from Superinstructions import Superinstructions
+from VMBytecode import VMBytecode
+
+
+PROGRAM = """
+class Main {
+    static int total;
+
+    function void main() {
+        var int i, key;
+        var Array a;
+        let a = Array.new(10);
+        while (i < 10) {
+            let a[i] = i;
+            let i = i + 1;
+        }
+        let key = 5;
+        while (~(key = 0)) {
+            let key = key - 1;
+            let total = total + 1;
+        }
+        if (~(i > 3)) { let total = total - 1; }
+        do Output.printInt(total);
+        return;
+    }
+}
+"""
+
+
+def compile_program(directory, *flags):
+    # Compiles PROGRAM with the given JackAnalyzer flags and returns the name of the written file.
+    file_name = os.path.join(directory, "Main.jack")
+    with open(file_name, "w") as f:
+        f.write(PROGRAM)
+
+    analyzer = os.path.join(os.path.dirname(os.path.abspath(__file__)), "JackAnalyzer.py")
+    subprocess.run([sys.executable, analyzer, file_name, "--optimize-branches", *flags],
+                   stdout=subprocess.DEVNULL, check=True)
+
+    return file_name.replace(".jack", ".vmb" if "--binary" in flags else ".vm")
+
+
+def read_commands(file_name):
+    with open(file_name) as f:
+        return f.read().splitlines()
+
+
+class TestSuperinstructions(unittest.TestCase):
+
+    def test_lowering_is_lossless(self):
+        with tempfile.TemporaryDirectory() as directory:
+            commands = read_commands(compile_program(directory))
+            extended = read_commands(compile_program(directory, "--extended"))
+
+        superinstructions = Superinstructions()
+        self.assertEqual(extended, superinstructions.fuse(commands))
+        self.assertEqual(superinstructions.lower(extended), commands)
+        self.assertLess(len(extended), len(commands))
+        self.assertTrue(any(command.startswith("inc ") for command in extended))
+        self.assertTrue(any(command.startswith("if-") for command in extended))
+
+
+    def test_binary_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            extended = read_commands(compile_program(directory, "--extended"))
+            with open(compile_program(directory, "--extended", "--binary"), "rb") as f:
+                decoded = list(VMBytecode().decode(f))
+
+        self.assertEqual(decoded, extended)
+
+
+    def test_bytecode_has_every_branch(self):
+        self.assertEqual(set(VMBytecode.BRANCHES), set(Superinstructions.BRANCHES))
+
+
+    def test_keeps_sequences_lowering_would_change(self):
+        # Only exact sequences are fused: the increment writes another variable, and 'not' isn't followed by if-goto.
+        commands = ["push local 0", "push constant 1", "add", "pop local 1", "lt", "not", "pop temp 0"]
+
+        self.assertEqual(Superinstructions().fuse(commands), commands)
+
+
+if __name__ == "__main__":
+    unittest.main()
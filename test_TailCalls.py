@@ -0,0 +1,70 @@
+import unittest
+from TailCalls import TailCalls
+
+
+class TestTailCalls(unittest.TestCase):
+
+    def test_turns_tail_call_into_jump(self):
+        # function int sum(int n, int acc) { if (n = 0) { return acc; } return Main.sum(n - 1, acc + n); }
+        commands = [
+            "function Main.sum 0",
+            "push argument 0", "push constant 0", "eq", "not", "if-goto L0",
+            "push argument 1", "return",
+            "label L0",
+            "push argument 0", "push constant 1", "sub",
+            "push argument 1", "push argument 0", "add",
+            "call Main.sum 2", "return"
+        ]
+
+        tail_calls = TailCalls()
+
+        self.assertEqual(tail_calls.eliminate(commands, 2), [
+            "function Main.sum 0",
+            "label TAIL_CALL_ENTRY",
+            "push argument 0", "push constant 0", "eq", "not", "if-goto L0",
+            "push argument 1", "return",
+            "label L0",
+            "push argument 0", "push constant 1", "sub",
+            "push argument 1", "push argument 0", "add",
+            "pop argument 1", "pop argument 0", "goto TAIL_CALL_ENTRY"
+        ])
+        self.assertEqual(tail_calls.transformed, [("Main.sum", 1)])
+
+
+    def test_keeps_other_calls(self):
+        # The result of the first call is used, the second one calls another subroutine
+        # and the third one has another number of arguments, so it isn't the same subroutine call.
+        commands = [
+            "function Main.f 0",
+            "push argument 0", "call Main.f 1", "push constant 1", "add", "pop temp 1",
+            "push argument 0", "call Main.g 1", "return",
+            "call Main.f 0", "return"
+        ]
+
+        tail_calls = TailCalls()
+
+        self.assertEqual(tail_calls.eliminate(commands, 1), commands)
+        self.assertEqual(tail_calls.transformed, [])
+
+
+    def test_resets_locals_read_before_written(self):
+        # function int zr(int n) { var int z, w; let z = z + 1; let w = n; if (n = 0) { return z; } return Main.zr(w - 1); }
+        # z relies on being 0 at the start of every call, w is written before it's read.
+        commands = [
+            "function Main.zr 2",
+            "push local 0", "push constant 1", "add", "pop local 0",
+            "push argument 0", "pop local 1",
+            "push argument 0", "push constant 0", "eq", "not", "if-goto L0",
+            "push local 0", "return",
+            "label L0",
+            "push local 1", "push constant 1", "sub",
+            "call Main.zr 1", "return"
+        ]
+
+        eliminated = TailCalls().eliminate(commands, 1)
+
+        self.assertEqual(eliminated[-5:], ["sub", "pop argument 0", "push constant 0", "pop local 0", "goto TAIL_CALL_ENTRY"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import io
+import unittest
+from VMBytecode import VMBytecode
+
+
+COMMANDS = [
+    "function Main.main 2",
+    "push constant 20000",
+    "pop local 1",
+    "label L0",
+    "push local 1",
+    "push constant 0",
+    "gt",
+    "not",
+    "if-goto L1",
+    "push local 1",
+    "push constant 1",
+    "sub",
+    "pop local 1",
+    "push argument 0",
+    "pop pointer 1",
+    "push that 3",
+    "pop static 200",
+    "goto L0",
+    "label L1",
+    "push local 1",
+    "call Output.printInt 1",
+    "pop temp 0",
+    "push constant 0",
+    "return"
+]
+
+
+class TestVMBytecode(unittest.TestCase):
+
+    def test_round_trip(self):
+        bytecode = VMBytecode()
+        data = bytecode.encode(COMMANDS)
+
+        self.assertEqual(list(bytecode.decode(io.BytesIO(data))), COMMANDS)
+        self.assertLess(len(data), len("\n".join(COMMANDS)))
+
+
+    def test_truncated_file(self):
+        bytecode = VMBytecode()
+        # Cuts the files inside a name of the string table and inside the two byte varint of the last command.
+        data = bytecode.encode(COMMANDS)
+        long_operand = bytecode.encode(COMMANDS[:-1] + ["push constant 20000"])
+
+        for truncated in (data[:data.index(b"Output.printInt") + 5], long_operand[:-1]):
+            with self.assertRaises(ValueError):
+                list(bytecode.decode(io.BytesIO(truncated)))
+
+
+    def test_not_bytecode(self):
+        with self.assertRaises(ValueError):
+            list(VMBytecode().decode(io.BytesIO(b"push constant 1\n")))
+
+
+if __name__ == "__main__":
+    unittest.main()